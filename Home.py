@@ -1,12 +1,17 @@
-import os
+import base64
+import hashlib
+import threading
 from typing import Dict
 from pathlib import Path
 
 import streamlit as st
 import logging
 
-from rag import RAGSystem
-from slack_bot import SlackBot
+from streamlit_session_memo import st_session_memo
+
+# rag and slack_bot are imported lazily inside the initialization paths:
+# they pull in LangChain, FAISS, the OpenAI SDK and Slack Bolt, which is a
+# lot of import work to pay before the user has even entered credentials
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,7 +38,126 @@ if "slack_bot" not in st.session_state:
 if "documents" not in st.session_state:
     st.session_state.documents = {}  # Store documents in memory
 
-# Ensure data directories exist
+UPLOAD_DIR = Path("data/rag-files")
+
+@st.cache_resource
+def _ensure_dirs() -> bool:
+    """Create the data directories once per process instead of on every rerun."""
+    for directory in (UPLOAD_DIR, Path("data/vectorstore"), Path("data/embed_cache")):
+        directory.mkdir(parents=True, exist_ok=True)
+    return True
+
+# Ensure data directories exist (cached, so reruns skip the stat calls)
+_ensure_dirs()
+
+# Default assistant prompt, parsed once at import instead of inside the
+# Advanced Settings expander on every rerun
+_DEFAULT_PROMPT = """<persona>
+You are Patrick, a sophisticated AI assistant with the warmth of a close friend and the precision of a scholar. Your responses combine deep knowledge with genuine empathy, making complex information accessible and engaging.
+
+Core Attributes:
+- Charming and articulate, with a gift for clear explanation
+- Deeply analytical while maintaining a warm, approachable tone
+- Confident in your knowledge while staying humble
+- Naturally weaves relevant information into conversational responses
+</persona>
+
+<context_processing>
+1. Document Analysis:
+   - Carefully consider all provided document content
+   - Identify key themes and relevant details
+   - Recognize patterns across multiple documents
+   - Note the source and context of information
+
+2. Web Search Integration:
+   - Extract current, factual information from web results
+   - Focus on authoritative sources
+   - Synthesize multiple perspectives
+   - Use specific details when available (dates, numbers, quotes)
+
+3. Response Formation:
+   - Begin with the most relevant information
+   - Layer in supporting details naturally
+   - Maintain conversational flow
+   - Use formatting to enhance readability
+</context_processing>
+
+<output_guidelines>
+- Start with a warm, engaging opener
+- Present information clearly and logically
+- Use bullet points for multiple pieces of information
+- Include specific details while maintaining natural flow
+- End with an invitation for further discussion
+- Format appropriately for Slack
+</output_guidelines>"""
+
+def _documents_hash(documents: Dict[str, dict]) -> str:
+    """Stable fingerprint of the uploaded document set."""
+    digest = hashlib.sha256()
+    for name in sorted(documents):
+        digest.update(name.encode())
+        digest.update(documents[name]["sha"].encode())
+    return digest.hexdigest()
+
+def _credentials_hash(credentials: Dict[str, str]) -> str:
+    """Stable fingerprint of the credential set."""
+    digest = hashlib.sha256()
+    for key in sorted(credentials):
+        digest.update(f"{key}={credentials[key]}".encode())
+    return digest.hexdigest()
+
+@st.cache_resource
+def get_embedder(api_key: str):
+    """Process-wide embeddings client so rebuilds reuse one connection pool."""
+    from langchain_openai import OpenAIEmbeddings
+
+    from rag import shared_http_client
+    return OpenAIEmbeddings(
+        api_key=api_key,
+        model="text-embedding-3-small",
+        chunk_size=512,
+        http_client=shared_http_client(),
+    )
+
+@st.cache_resource
+def get_chat_llm(api_key: str):
+    """Process-wide chat client, shared across RAG rebuilds."""
+    from langchain_community.chat_models import ChatOpenAI
+
+    from rag import shared_http_client
+    return ChatOpenAI(model_name="gpt-4", api_key=api_key, http_client=shared_http_client())
+
+def build_rag(doc_hash: str, creds_hash: str, _documents: Dict[str, dict], _credentials: Dict[str, str]) -> "RAGSystem":
+    """Build and initialize a RAGSystem for the given document/credential set."""
+    from rag import RAGSystem
+
+    openai_key = _credentials["OPENAI_API_KEY"]
+    rag_system = RAGSystem(
+        _documents,
+        _credentials,
+        embeddings=get_embedder(openai_key),
+        llm=get_chat_llm(openai_key),
+    )
+    if not rag_system.initialize_system():
+        # Raise so a failed build is not cached
+        raise RuntimeError("Failed to initialize RAG system")
+    return rag_system
+
+@st_session_memo
+def _session_rag(doc_hash: str, creds_hash: str) -> "RAGSystem":
+    """Session-scoped memoized RAG build.
+
+    cache_resource is global across sessions, which is the wrong scope for
+    per-user documents; session state would re-serialize the store each
+    rerun. A session memo keyed by the document/credential hashes builds
+    each session's RAG once and keeps it private to that session.
+    """
+    return build_rag(
+        doc_hash,
+        creds_hash,
+        st.session_state.documents,
+        st.session_state.credentials,
+    )
 
 def validate_credentials() -> bool:
     """Validate that all required credentials are present."""
@@ -62,25 +186,92 @@ def validate_credentials() -> bool:
         st.error("Error loading credentials. Please check your configuration.")
         return False
 
+def _init_key() -> str:
+    """Fingerprint of the inputs that drive initialization.
+
+    Used to make repeat Validate/Start clicks with identical credentials
+    and documents a no-op instead of a full RAG teardown and rebuild.
+    """
+    creds = st.session_state.credentials
+    parts = [
+        creds.get("OPENAI_API_KEY", ""),
+        creds.get("SLACK_BOT_TOKEN", ""),
+        creds.get("SLACK_APP_TOKEN", ""),
+        _documents_hash(st.session_state.documents),
+    ]
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
+def _bg_init(doc_hash: str, creds_hash: str, init_key: str) -> None:
+    """Build the RAG system off the main thread and hand it to the session."""
+    try:
+        from slack_bot import SlackBot
+
+        st.session_state.rag_system = _session_rag(doc_hash, creds_hash)
+        st.session_state.slack_bot = SlackBot(st.session_state.rag_system, st.session_state.credentials)
+        # Recorded only after a successful build, so the "already
+        # initialized" no-op gate never engages for a failed attempt
+        st.session_state.last_init_key = init_key
+        st.session_state.rag_progress = 1.0
+        logger.info("Background RAG initialization finished")
+    except Exception as e:
+        logger.error(f"Background RAG initialization failed: {str(e)}")
+        st.session_state.rag_error = str(e)
+        st.session_state.rag_progress = -1.0
+
+def start_background_init() -> None:
+    """Kick off RAG initialization on a worker thread so the UI stays responsive.
+
+    Progress is tracked in st.session_state.rag_progress (0.0 building,
+    1.0 done, -1.0 failed) and polled by _show_init_status.
+    """
+    from streamlit.runtime.scriptrunner import add_script_run_ctx
+
+    if st.session_state.get("rag_progress") == 0.0:
+        return  # a build is already running
+    st.session_state.rag_progress = 0.0
+    st.session_state.rag_error = None
+    thread = threading.Thread(
+        target=_bg_init,
+        args=(
+            _documents_hash(st.session_state.documents),
+            _credentials_hash(st.session_state.credentials),
+            _init_key(),
+        ),
+        daemon=True,
+    )
+    add_script_run_ctx(thread)
+    thread.start()
+
+def _show_init_status() -> None:
+    """Surface background initialization status, polling while it runs."""
+    progress = st.session_state.get("rag_progress")
+    if progress is None:
+        return
+    if progress < 0:
+        st.error(f"Initialization failed: {st.session_state.get('rag_error')}")
+    elif progress < 1.0:
+        from streamlit_autorefresh import st_autorefresh
+
+        st_autorefresh(interval=1000, key="rag_poll")
+        st.info("Building the knowledge base in the background... you can keep browsing meanwhile.")
+
 def initialize_systems():
     """Initialize RAG and Slack systems."""
     if st.session_state.credentials_valid and st.session_state.documents:
         try:
-            # Initialize RAG system with in-memory documents
-            st.session_state.rag_system = RAGSystem(st.session_state.documents, st.session_state.credentials)
-            
-            # Initialize RAG system
-            if st.session_state.rag_system.initialize_system():
-                logger.info("RAG system initialized successfully")
-                # Initialize Slack bot with the same RAG instance
-                st.session_state.slack_bot = SlackBot(st.session_state.rag_system, st.session_state.credentials)
-                st.success("Systems initialized successfully!")
-                return True
-            else:
-                logger.error("Failed to initialize RAG system")
-                st.error("Failed to initialize RAG system. Please check your documents.")
-                return False
-                
+            from slack_bot import SlackBot
+
+            # Build (or fetch the session-memoized) RAG system for this document set
+            st.session_state.rag_system = _session_rag(
+                _documents_hash(st.session_state.documents),
+                _credentials_hash(st.session_state.credentials),
+            )
+            logger.info("RAG system initialized successfully")
+            # Initialize Slack bot with the same RAG instance
+            st.session_state.slack_bot = SlackBot(st.session_state.rag_system, st.session_state.credentials)
+            st.success("Systems initialized successfully!")
+            return True
+
         except Exception as e:
             logger.error(f"Error initializing systems: {str(e)}")
             st.error("Error initializing systems. Please check your credentials and documents.")
@@ -109,19 +300,44 @@ def handle_document_upload():
     
     if uploaded_file:
         try:
-            # Read file content
-            file_content = uploaded_file.read()
-            
-            # Store in session state
-            st.session_state.documents[uploaded_file.name] = file_content
-            
+            # Stream the file to disk in 1MB chunks instead of buffering the
+            # whole payload in session state
+            dest = UPLOAD_DIR / uploaded_file.name
+            digest = hashlib.sha256()
+            size = 0
+            with open(dest, "wb") as out:
+                while chunk := uploaded_file.read(1 << 20):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+
+            # Skip re-uploads of identical content (even under a new name) so
+            # the index never accumulates duplicate chunks
+            record = {"path": str(dest), "size": size, "sha": digest.hexdigest()}
+            existing_shas = {d["sha"] for d in st.session_state.documents.values()}
+            if record["sha"] in existing_shas:
+                if uploaded_file.name not in st.session_state.documents:
+                    dest.unlink(missing_ok=True)
+                logger.info(f"Skipping duplicate upload: {uploaded_file.name}")
+                st.info(f"Duplicate skipped: {uploaded_file.name} matches an already uploaded document.")
+                return
+
+            # Store only the path and metadata in session state
+            st.session_state.documents[uploaded_file.name] = record
+
             # Log success
-            logger.info(f"Successfully stored document: {uploaded_file.name}")
+            logger.info(f"Successfully stored document: {uploaded_file.name} ({size} bytes)")
             st.success(f"File {uploaded_file.name} uploaded successfully!")
-            
-            # Initialize systems with updated documents
-            if st.session_state.credentials_valid:
-                initialize_systems()
+
+            # Index incrementally if the RAG system is already running;
+            # only do a full initialization on the first upload
+            if st.session_state.rag_system and st.session_state.rag_system.is_initialized():
+                if st.session_state.rag_system.add_documents({uploaded_file.name: record}):
+                    logger.info(f"Incrementally indexed document: {uploaded_file.name}")
+                else:
+                    st.error("Failed to index the uploaded document. Try rebuilding the index.")
+            elif st.session_state.credentials_valid:
+                start_background_init()
             
         except Exception as e:
             logger.error(f"Error processing uploaded file: {str(e)}")
@@ -131,18 +347,13 @@ def initialize_rag_system():
     """Initialize or reinitialize the RAG system with current documents."""
     if st.session_state.documents:
         try:
-            st.session_state.rag_system = RAGSystem(
-                documents=st.session_state.documents,
-                credentials=st.session_state.credentials
+            st.session_state.rag_system = _session_rag(
+                _documents_hash(st.session_state.documents),
+                _credentials_hash(st.session_state.credentials),
             )
-            
-            if st.session_state.rag_system.initialize_system():
-                logger.info("RAG system initialized successfully")
-                st.success("RAG system initialized successfully!")
-            else:
-                logger.error("Failed to initialize RAG system")
-                st.error("Failed to initialize RAG system. Please check your documents.")
-                
+            logger.info("RAG system initialized successfully")
+            st.success("RAG system initialized successfully!")
+
         except Exception as e:
             logger.error(f"Error initializing RAG system: {str(e)}")
             st.error("Error initializing RAG system. Please check your credentials and documents.")
@@ -150,25 +361,33 @@ def initialize_rag_system():
         logger.warning("No documents available to initialize RAG system")
         st.warning("Please upload at least one document to initialize the RAG system.")
 
-def display_documents():
-    """Display uploaded documents and provide options to manage them."""
+@st.fragment
+def _doc_list_fragment():
+    """Document list as a fragment so deletes rerun only this block, not the whole page."""
     if st.session_state.documents:
         st.write("### Uploaded Documents")
-        for filename in st.session_state.documents.keys():
+        for filename in list(st.session_state.documents.keys()):
             col1, col2 = st.columns([3, 1])
             with col1:
                 st.write(f"📄 {filename}")
             with col2:
                 if st.button("Delete", key=f"del_{filename}"):
                     del st.session_state.documents[filename]
-                    st.rerun()
-        
+                    st.rerun(scope="fragment")
+
         if st.button("Clear All Documents"):
             st.session_state.documents = {}
-            st.rerun()
+            st.rerun(scope="fragment")
+
+        if st.button("Rebuild Index"):
+            initialize_systems()
     else:
         st.info("No documents uploaded yet.")
 
+def display_documents():
+    """Display uploaded documents and provide options to manage them."""
+    _doc_list_fragment()
+
 def reset_bot_state():
     """Reset bot-related session state variables."""
     st.session_state.bot_running = False
@@ -178,7 +397,17 @@ def reset_bot_state():
 
 def start_bot():
     """Start the bot with proper initialization."""
-    if initialize_systems():
+    # Skip re-initialization when the systems are already built for the
+    # exact same credentials and documents
+    ready = (
+        st.session_state.rag_system is not None
+        and st.session_state.slack_bot is not None
+        and st.session_state.get("last_init_key") == _init_key()
+    )
+    if not ready and initialize_systems():
+        st.session_state.last_init_key = _init_key()
+        ready = True
+    if ready:
         if st.session_state.slack_bot.start():
             st.session_state.bot_running = True
             logger.info("Bot started successfully")
@@ -197,6 +426,71 @@ def stop_bot():
     reset_bot_state()
     st.rerun()
 
+@st.cache_data
+def _logo_bytes() -> bytes:
+    """Read the logo once per process instead of on every rerun."""
+    return Path("assets/logo.png").read_bytes()
+
+# Footer/sidebar badges: (asset name, link, remote fallback image)
+_BADGES = [
+    ("github", "https://github.com/williavs",
+     "https://img.shields.io/badge/GitHub-100000?style=for-the-badge&logo=github&logoColor=white"),
+    ("linkedin", "https://www.linkedin.com/in/willyv3/",
+     "https://img.shields.io/badge/LinkedIn-0077B5?style=for-the-badge&logo=linkedin&logoColor=white"),
+    ("v3ai", "https://v3-ai.com",
+     "https://img.shields.io/badge/V3_AI-FF4B4B?style=for-the-badge&logo=safari&logoColor=white"),
+    ("pmfeels", "https://pmfeels.com",
+     "https://img.shields.io/badge/PM_Feels-4A154B?style=for-the-badge&logo=slack&logoColor=white"),
+]
+
+@st.cache_data
+def _badge_src(name: str, remote_url: str) -> str:
+    """Image source for a badge.
+
+    Uses a base64 data URI when assets/badges/<name>.png exists (no
+    cross-origin request per rerun), otherwise falls back to shields.io.
+    """
+    local = Path("assets/badges") / f"{name}.png"
+    if local.exists():
+        return "data:image/png;base64," + base64.b64encode(local.read_bytes()).decode()
+    return remote_url
+
+@st.cache_data
+def _footer_html() -> str:
+    """Static footer HTML, built once and reused across reruns."""
+    links = "&nbsp;".join(
+        f'<a href="{link}" target="_blank"><img src="{_badge_src(name, remote)}" height="28px"/></a>'
+        for name, link, remote in _BADGES
+    )
+    return f'<div style="text-align: center;">{links}</div>'
+
+@st.cache_data
+def _sidebar_md() -> str:
+    """Static sidebar markdown, built once and reused across reruns."""
+    github_src = _badge_src("github", _BADGES[0][2])
+    linkedin_src = _badge_src("linkedin", _BADGES[1][2])
+    return f"""
+    ### 🛠️ Need Custom Tools?
+
+    This tool was built by [WillyV3](https://www.linkedin.com/in/willyv3/), founder of [V3 AI](https://v3-ai.com).
+    We specialize in building custom data tools for:
+
+    - 🎯 Go-to-Market Intelligence
+    - 🔍 Lead Generation & Enrichment
+    - 📊 Market Research Automation
+    - 🤖 AI-Powered Data Processing
+    - 🔄 Workflow Automation
+
+    #### Featured Projects:
+    - [V3 AI Platform](https://v3-ai.com) - Enterprise AI Solutions
+    - [PM Feels](https://pmfeels.com) - Product Management Tools
+    - [Sagedoc](https://sagedoc.me) - AI Documentation
+
+    #### Let's Connect:
+    [![GitHub]({github_src})](https://github.com/williavs)
+    [![LinkedIn]({linkedin_src})](https://www.linkedin.com/in/willyv3/)
+    """
+
 def show_welcome():
     """Display the welcome section."""
     st.title("SlackSage")
@@ -242,8 +536,8 @@ def show_welcome():
     """)
 
     try:
-        st.image("assets/logo.png", use_container_width=True)
-    except:
+        st.image(_logo_bytes(), use_container_width=True)
+    except Exception:
         pass
 
 def show_footer():
@@ -252,22 +546,7 @@ def show_footer():
     footer_cols = st.columns([1, 4, 1])
     
     with footer_cols[1]:
-        st.markdown("""
-        <div style="text-align: center;">
-            <a href="https://github.com/williavs" target="_blank">
-                <img src="https://img.shields.io/badge/GitHub-100000?style=for-the-badge&logo=github&logoColor=white" height="28px"/>
-            </a>&nbsp;
-            <a href="https://www.linkedin.com/in/willyv3/" target="_blank">
-                <img src="https://img.shields.io/badge/LinkedIn-0077B5?style=for-the-badge&logo=linkedin&logoColor=white" height="28px"/>
-            </a>&nbsp;
-            <a href="https://v3-ai.com" target="_blank">
-                <img src="https://img.shields.io/badge/V3_AI-FF4B4B?style=for-the-badge&logo=safari&logoColor=white" height="28px"/>
-            </a>&nbsp;
-            <a href="https://pmfeels.com" target="_blank">
-                <img src="https://img.shields.io/badge/PM_Feels-4A154B?style=for-the-badge&logo=slack&logoColor=white" height="28px"/>
-            </a>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_footer_html(), unsafe_allow_html=True)
 
 def main():
     # Initialize session state (keep existing initialization code)
@@ -275,29 +554,9 @@ def main():
     
     # Show welcome section
     show_welcome()
-    st.sidebar.image("assets/logo.png", use_container_width=True)
+    st.sidebar.image(_logo_bytes(), use_container_width=True)
     st.sidebar.markdown("---")
-    st.sidebar.markdown("""
-    ### 🛠️ Need Custom Tools?
-    
-    This tool was built by [WillyV3](https://www.linkedin.com/in/willyv3/), founder of [V3 AI](https://v3-ai.com).
-    We specialize in building custom data tools for:
-    
-    - 🎯 Go-to-Market Intelligence
-    - 🔍 Lead Generation & Enrichment
-    - 📊 Market Research Automation
-    - 🤖 AI-Powered Data Processing
-    - 🔄 Workflow Automation
-    
-    #### Featured Projects:
-    - [V3 AI Platform](https://v3-ai.com) - Enterprise AI Solutions
-    - [PM Feels](https://pmfeels.com) - Product Management Tools
-    - [Sagedoc](https://sagedoc.me) - AI Documentation
-    
-    #### Let's Connect:
-    [![GitHub](https://img.shields.io/badge/GitHub-100000?style=for-the-badge&logo=github&logoColor=white)](https://github.com/williavs)
-    [![LinkedIn](https://img.shields.io/badge/LinkedIn-0077B5?style=for-the-badge&logo=linkedin&logoColor=white)](https://www.linkedin.com/in/willyv3/)
-    """)
+    st.sidebar.markdown(_sidebar_md())
     
     
     # Add a divider before the main interface
@@ -316,49 +575,58 @@ def main():
         - Configure the required permissions
         """)
         
-        # OpenAI API Key
-        col1, col2 = st.columns([3,1])
-        with col1:
-            openai_key = st.text_input(
-                "OpenAI API Key", 
-                value=st.session_state.credentials.get("OPENAI_API_KEY", ""),
+        # A form buffers the inputs client-side so the script reruns once on
+        # submit instead of on every keystroke
+        with st.form("creds_form", clear_on_submit=False):
+            # OpenAI API Key
+            col1, col2 = st.columns([3,1])
+            with col1:
+                openai_key = st.text_input(
+                    "OpenAI API Key",
+                    value=st.session_state.credentials.get("OPENAI_API_KEY", ""),
+                    type="password",
+                    help="Your OpenAI API key (starts with 'sk-')"
+                )
+            with col2:
+                st.markdown("<br>", unsafe_allow_html=True)  # Add spacing
+                st.markdown("[Get API Key](https://platform.openai.com/api-keys)")
+
+            # Slack Bot Token
+            slack_bot_token = st.text_input(
+                "Slack Bot Token",
+                value=st.session_state.credentials.get("SLACK_BOT_TOKEN", ""),
                 type="password",
-                help="Your OpenAI API key (starts with 'sk-')"
+                help="Your Slack Bot User OAuth Token (starts with 'xoxb-')"
             )
-        with col2:
-            st.markdown("<br>", unsafe_allow_html=True)  # Add spacing
-            st.markdown("[Get API Key](https://platform.openai.com/api-keys)")
-        if openai_key:
-            st.session_state.credentials["OPENAI_API_KEY"] = openai_key
-        
-        # Slack Bot Token
-        slack_bot_token = st.text_input(
-            "Slack Bot Token", 
-            value=st.session_state.credentials.get("SLACK_BOT_TOKEN", ""),
-            type="password",
-            help="Your Slack Bot User OAuth Token (starts with 'xoxb-')"
-        )
-        if slack_bot_token:
-            st.session_state.credentials["SLACK_BOT_TOKEN"] = slack_bot_token
-        
-        # Slack App Token
-        slack_app_token = st.text_input(
-            "Slack App Token", 
-            value=st.session_state.credentials.get("SLACK_APP_TOKEN", ""),
-            type="password",
-            help="Your Slack App-Level Token (starts with 'xapp-')"
-        )
-        if slack_app_token:
-            st.session_state.credentials["SLACK_APP_TOKEN"] = slack_app_token
-        
-        # Validate Button
-        if st.button("Validate Credentials"):
+
+            # Slack App Token
+            slack_app_token = st.text_input(
+                "Slack App Token",
+                value=st.session_state.credentials.get("SLACK_APP_TOKEN", ""),
+                type="password",
+                help="Your Slack App-Level Token (starts with 'xapp-')"
+            )
+
+            submitted = st.form_submit_button("Validate Credentials")
+
+        if submitted:
+            if openai_key:
+                st.session_state.credentials["OPENAI_API_KEY"] = openai_key
+            if slack_bot_token:
+                st.session_state.credentials["SLACK_BOT_TOKEN"] = slack_bot_token
+            if slack_app_token:
+                st.session_state.credentials["SLACK_APP_TOKEN"] = slack_app_token
+
             validation_results = validate_credentials()
             st.session_state.credentials_valid = validation_results
-            
+
             if st.session_state.credentials_valid:
                 st.success("All credentials are valid! ✅")
-                initialize_systems()
+                if st.session_state.documents:
+                    if _init_key() == st.session_state.get("last_init_key"):
+                        st.info("Already initialized with these credentials and documents.")
+                    else:
+                        start_background_init()
             else:
                 st.error("Invalid credentials. Please check the warnings and try again.")
     
@@ -366,6 +634,7 @@ def main():
     if st.session_state.credentials_valid:
         with tab2:
             st.header("📚 Document Management")
+            _show_init_status()
             handle_document_upload()
             display_documents()
             
@@ -396,46 +665,8 @@ def main():
             
             # Advanced Settings (keep existing)
             with st.expander("🛠️ Advanced Settings - Customize Assistant Prompt"):
-                if "custom_prompt" not in st.session_state:
-                    st.session_state.custom_prompt = """<persona>
-                    You are Patrick, a sophisticated AI assistant with the warmth of a close friend and the precision of a scholar. Your responses combine deep knowledge with genuine empathy, making complex information accessible and engaging.
-
-                    Core Attributes:
-                    - Charming and articulate, with a gift for clear explanation
-                    - Deeply analytical while maintaining a warm, approachable tone
-                    - Confident in your knowledge while staying humble
-                    - Naturally weaves relevant information into conversational responses
-                    </persona>
-
-                    <context_processing>
-                    1. Document Analysis:
-                       - Carefully consider all provided document content
-                       - Identify key themes and relevant details
-                       - Recognize patterns across multiple documents
-                       - Note the source and context of information
-
-                    2. Web Search Integration:
-                       - Extract current, factual information from web results
-                       - Focus on authoritative sources
-                       - Synthesize multiple perspectives
-                       - Use specific details when available (dates, numbers, quotes)
-
-                    3. Response Formation:
-                       - Begin with the most relevant information
-                       - Layer in supporting details naturally
-                       - Maintain conversational flow
-                       - Use formatting to enhance readability
-                    </context_processing>
-
-                    <output_guidelines>
-                    - Start with a warm, engaging opener
-                    - Present information clearly and logically
-                    - Use bullet points for multiple pieces of information
-                    - Include specific details while maintaining natural flow
-                    - End with an invitation for further discussion
-                    - Format appropriately for Slack
-                    </output_guidelines>"""
-                
+                st.session_state.setdefault("custom_prompt", _DEFAULT_PROMPT)
+
                 st.text_area(
                     "Customize Assistant Prompt",
                     value=st.session_state.custom_prompt,
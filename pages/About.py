@@ -1,19 +1,35 @@
+from pathlib import Path
+
 import streamlit as st
+from PIL import Image
+
+# Resolve assets relative to the repo root so the page works regardless
+# of the working directory streamlit was launched from
+ASSETS_DIR = Path(__file__).resolve().parent.parent / "assets"
+LOGO_PATH = ASSETS_DIR / "logo.png"
 
 # Must be the first Streamlit command
 st.set_page_config(
     page_title="About - SlackSage",
-    page_icon="assets/logo.png",
+    page_icon=str(LOGO_PATH),
     layout="wide"
 )
 
-def show_footer():
-    """Display the footer with links."""
-    st.divider()
-    footer_cols = st.columns([1, 4, 1])
-    
-    with footer_cols[1]:
-        st.markdown("""
+@st.cache_resource
+def _logo():
+    """Open the logo once per process instead of re-reading it each rerun.
+
+    Returns None when the asset is missing so callers can fall back
+    without swallowing unrelated errors.
+    """
+    if not LOGO_PATH.is_file():
+        return None
+    return Image.open(LOGO_PATH)
+
+@st.cache_data
+def _footer_html() -> str:
+    """Static footer HTML, built once and reused across reruns."""
+    return """
         <div style="text-align: center;">
             <a href="https://github.com/williavs" target="_blank">
                 <img src="https://img.shields.io/badge/GitHub-100000?style=for-the-badge&logo=github&logoColor=white" height="28px"/>
@@ -28,20 +44,14 @@ def show_footer():
                 <img src="https://img.shields.io/badge/PM_Feels-4A154B?style=for-the-badge&logo=slack&logoColor=white" height="28px"/>
             </a>
         </div>
-        """, unsafe_allow_html=True)
-
-# Move logo to sidebar
-try:
-    st.sidebar.image("assets/logo.png", use_container_width=True)
-except:
-    st.sidebar.write("SlackSage")
-st.sidebar.markdown("---")
-
-st.title("About SlackSage")
-
-st.markdown("""
-SlackSage is an intelligent document companion that brings the wisdom of your knowledge base to Slack. 
-By combining the power of RAG (Retrieval Augmented Generation) with natural conversation, 
+        """
+
+@st.cache_data
+def _about_md() -> str:
+    """Static intro markdown."""
+    return """
+SlackSage is an intelligent document companion that brings the wisdom of your knowledge base to Slack.
+By combining the power of RAG (Retrieval Augmented Generation) with natural conversation,
 SlackSage transforms your documents into an accessible source of wisdom for your entire team.
 
 ### Key Features
@@ -52,21 +62,16 @@ SlackSage transforms your documents into an accessible source of wisdom for your
 - 🎯 Context-Aware: Provides accurate, relevant responses based on your specific needs
 
 ---
-""")
-
-# Original About Content
-st.header("About the Creator")
-try:
-    st.image("assets/logo.png", width=150)
-except:
-    pass
+"""
 
-# Main content section
-st.markdown("""
+@st.cache_data
+def _creator_md() -> str:
+    """Static creator bio markdown."""
+    return """
 ## William VanSickle III
 ### Founder, V3 AI | Product Manager @ Justworks
 
-Based in Brooklyn, I bridge the worlds of AI engineering and product management. 
+Based in Brooklyn, I bridge the worlds of AI engineering and product management.
 Currently shaping the future of HR tech at Justworks while building innovative AI solutions through V3 AI.
 
 ### Expertise
@@ -80,7 +85,70 @@ Currently shaping the future of HR tech at Justworks while building innovative A
 [![GitHub](https://img.shields.io/badge/GitHub-100000?style=for-the-badge&logo=github&logoColor=white)](https://github.com/williavs)
 [![LinkedIn](https://img.shields.io/badge/LinkedIn-0077B5?style=for-the-badge&logo=linkedin&logoColor=white)](https://www.linkedin.com/in/willyv3/)
 [![Website](https://img.shields.io/badge/Website-FF4B4B?style=for-the-badge&logo=safari&logoColor=white)](https://v3-ai.com)
-""")
+"""
+
+@st.cache_data
+def _enterprise_md() -> str:
+    """Static enterprise solutions markdown."""
+    return """
+    ### What V3 AI Can Build For You
+
+    1. **Enterprise AI Integration**
+       - Custom LLM solutions
+       - Workflow automation
+       - Document processing & analysis
+       - Intelligent data pipelines
+
+    2. **AI-Powered Tools**
+       - Custom GPT integrations
+       - Natural language interfaces
+       - Automated reporting
+       - Predictive analytics
+
+    3. **Specialized Solutions**
+       - Industry-specific AI tools
+       - Custom AI platforms
+       - Integration with existing systems
+       - Scalable AI infrastructure
+
+    ### Our Process
+    1. Free Consultation
+    2. Solution Design
+    3. Proof of Concept
+    4. Development & Testing
+    5. Deployment & Training
+    6. Ongoing Support
+
+    [**Schedule a Consultation →**](https://v3-ai.com)
+    """
+
+def show_footer():
+    """Display the footer with links."""
+    st.divider()
+    footer_cols = st.columns([1, 4, 1])
+
+    with footer_cols[1]:
+        st.markdown(_footer_html(), unsafe_allow_html=True)
+
+# Move logo to sidebar
+logo = _logo()
+if logo is not None:
+    st.sidebar.image(logo, use_container_width=True)
+else:
+    st.sidebar.write("SlackSage")
+st.sidebar.markdown("---")
+
+st.title("About SlackSage")
+
+st.markdown(_about_md())
+
+# Original About Content
+st.header("About the Creator")
+if logo is not None:
+    st.image(logo, width=150)
+
+# Main content section
+st.markdown(_creator_md())
 
 # Featured Solutions section
 st.header("Featured Solutions")
@@ -126,37 +194,7 @@ with col3:
 
 # Enterprise AI Solutions section
 with st.expander("🛠️ Enterprise AI Solutions"):
-    st.markdown("""
-    ### What V3 AI Can Build For You
-
-    1. **Enterprise AI Integration**
-       - Custom LLM solutions
-       - Workflow automation
-       - Document processing & analysis
-       - Intelligent data pipelines
-
-    2. **AI-Powered Tools**
-       - Custom GPT integrations
-       - Natural language interfaces
-       - Automated reporting
-       - Predictive analytics
-
-    3. **Specialized Solutions**
-       - Industry-specific AI tools
-       - Custom AI platforms
-       - Integration with existing systems
-       - Scalable AI infrastructure
-
-    ### Our Process
-    1. Free Consultation
-    2. Solution Design
-    3. Proof of Concept
-    4. Development & Testing
-    5. Deployment & Training
-    6. Ongoing Support
-
-    [**Schedule a Consultation →**](https://v3-ai.com)
-    """)
+    st.markdown(_enterprise_md())
 
 # Contact section
 st.header("Get in Touch")
@@ -181,4 +219,4 @@ with col3:
     st.markdown("### LinkedIn\n👔 [linkedin.com/in/willyv3](https://www.linkedin.com/in/willyv3/)")
 
 # Footer
-show_footer() 
\ No newline at end of file
+show_footer()
@@ -1,19 +1,31 @@
+import asyncio
+import hashlib
 import logging
 import os
-from typing import Any, Dict, List, TypedDict, Union
+import re
+import threading
+import time
+import functools
+import queue
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TypedDict, Union
 from io import BytesIO
 import tempfile
-import fitz  # PyMuPDF import
+import httpx
+import numpy as np
 
-from googleapiclient.discovery import build
+# Heavy third-party modules (faiss, fitz, the OpenAI clients, langgraph,
+# the Google API client) are imported inside the functions that need them
+# so importing this module stays cheap for callers that only touch part
+# of it. The langchain base classes below are needed at definition time.
 from langchain.callbacks.base import BaseCallbackHandler
-from langchain.schema import Document
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.schema import Document, HumanMessage, SystemMessage
+from langchain.storage import LocalFileStore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.chat_models import ChatOpenAI
-from langchain_community.vectorstores import FAISS
 from langchain_core.pydantic_v1 import BaseModel
-from langchain_openai import OpenAIEmbeddings
-from langgraph.graph import END, StateGraph
 
 
 # Configure logging
@@ -23,66 +35,284 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Embedding requests are network-bound; batching texts per request and
+# overlapping a bounded number of requests cuts index-build wall time
+EMBED_BATCH_SIZE = 96
+EMBED_CONCURRENCY = 8
+
+# Query-embedding micro-batching: concurrent queries arriving within the
+# coalescing window share one embedding request instead of one HTTP
+# round trip each. The window stays small enough to be invisible at p50
+QUERY_BATCH_MAX = 32
+QUERY_BATCH_WINDOW = 0.008
+
+# HNSW parameters: graph degree and search/build effort. Gives roughly
+# O(log N) retrieval at >0.95 recall versus the flat index's linear scan.
+# Below HNSW_THRESHOLD chunks an exact flat scan is already fast, so the
+# graph build cost and recall loss buy nothing
+HNSW_THRESHOLD = 2000
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Above this many chunks, compress vectors with product quantization:
+# 8-bit PQ codes cut vector memory ~4-8x versus fp32 at a small recall cost
+PQ_THRESHOLD = 10000
+PQ_M = 16  # sub-quantizers per vector; must divide the embedding dimension
+
+# Returned (not raised) when the pipeline fails, so callers can tell a
+# real answer from an error without parsing exceptions
+PROCESS_ERROR_RESPONSE = (
+    "I apologize, but I encountered an error while processing your request. "
+    "Please try again or contact support if the issue persists."
+)
+
+# Retrieved-document cache: repeat queries skip the vector search even
+# when the final answer isn't cached. Dropped wholesale whenever the
+# index changes
+RETRIEVAL_CACHE_SIZE = 256
+RETRIEVAL_CACHE_TTL = 900
+
+# Hot query vectors are kept in memory as float16: the disk-backed
+# embedding cache dedups across restarts but still costs a store read
+# per query, and cosine ranking is robust to fp16 rounding
+QUERY_EMBED_CACHE_SIZE = 4096
+
+# Token-aware chunking sized to the embedding model: measuring chunks in
+# the encoder's own tokens keeps them aligned with embedding cost, and
+# trailing fragments under the minimum are merged so no API call is
+# spent embedding a runt
+SPLIT_CHUNK_TOKENS = 512
+SPLIT_OVERLAP_TOKENS = 64
+SPLIT_MIN_TOKENS = 64
+
+# PDFs at or above this page count are extracted across a thread pool;
+# below it the pool overhead outweighs the win
+PDF_PARALLEL_THRESHOLD = 8
+PDF_MAX_WORKERS = 8
+
+# Built FAISS indexes are persisted here, keyed by corpus content hash,
+# so unchanged document sets load from disk instead of re-embedding
+VECTORSTORE_CACHE_DIR = Path("data/vectorstore")
+
+# One HTTP/2 connection pool shared by the chat and embedding clients:
+# multiplexing over persistent connections avoids a TLS handshake per call
+_http_client = None
+
+def shared_http_client() -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(http2=True, timeout=60.0)
+    return _http_client
+
+@functools.lru_cache(maxsize=4)
+def _cse_service(developer_key: str):
+    """Build the Custom Search client once per API key.
+
+    Discovery-document fetch and client construction cost far more than a
+    single search, so reuse the service across queries.
+    """
+    from googleapiclient.discovery import build
+
+    return build("customsearch", "v1", developerKey=developer_key)
+
+# Routing keywords, hoisted to module scope so the per-query hot path
+# does membership tests against prebuilt structures instead of
+# reconstructing the lists on every call
+_WEB_TRIGGERS = frozenset([
+    "latest", "recent", "current", "new",
+    "compare", "vs", "versus", "difference",
+    "review", "today", "now", "update",
+])
+_TOPIC_RE = re.compile(r"spiritual|machine|consciousness|intelligence")
+
+class EmbedBatcher:
+    """Micro-batches concurrent query embeddings into one request.
+
+    Callers hand their text to a background thread and block on a
+    Future; the thread collects whatever else arrives within the
+    coalescing window (up to QUERY_BATCH_MAX texts) and issues a single
+    batched embedding call. During bursts this collapses N small HTTP
+    round trips into one vectorized request, at the cost of a few
+    milliseconds when traffic is idle.
+    """
+
+    def __init__(self, embeddings, max_batch: int = QUERY_BATCH_MAX, window: float = QUERY_BATCH_WINDOW):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.window = window
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def embed(self, text: str) -> List[float]:
+        """Queue a text for the next batch and wait for its vector."""
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _worker(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in pending]
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(pending, vectors):
+                future.set_result(vector)
+
+
 class VectorStoreManager:
-    def __init__(self, documents: Dict[str, bytes], credentials: Dict[str, str]):
-        """Initialize the VectorStoreManager with documents and credentials."""
+    def __init__(self, documents: Dict[str, Any], credentials: Dict[str, str], embeddings=None):
+        """Initialize the VectorStoreManager with documents and credentials.
+
+        Document entries are either raw bytes or upload records of the form
+        {"path": ..., "size": ..., "sha": ...}; file-backed entries are read
+        from disk on demand so large payloads never sit in session memory.
+        An already-constructed embeddings client can be injected so rebuilds
+        share one connection pool instead of re-negotiating TLS each time.
+        """
+        from langchain_openai import OpenAIEmbeddings
+
         self.documents = {}
         self.vectorstore = None
-        self.embeddings = OpenAIEmbeddings(api_key=credentials["OPENAI_API_KEY"])
+        # Cache embeddings on disk keyed by chunk hash, so re-uploads and
+        # server restarts skip the embedding API for unchanged chunks
+        base_embeddings = embeddings or OpenAIEmbeddings(
+            api_key=credentials["OPENAI_API_KEY"],
+            chunk_size=512,
+            http_client=shared_http_client()
+        )
+        self.embeddings = CacheBackedEmbeddings.from_bytes_store(
+            base_embeddings,
+            LocalFileStore("data/embed_cache"),
+            namespace=base_embeddings.model,
+            query_embedding_cache=True
+        )
         
         # Store documents
-        for filename, content in documents.items():
-            if isinstance(content, bytes):
-                self.documents[filename] = content
+        for filename, entry in documents.items():
+            if self._is_valid_entry(entry):
+                self.documents[filename] = entry
                 logger.info(f"Stored document: {filename}")
             else:
-                logger.error(f"Invalid content type for {filename}: {type(content)}")
-        
+                logger.error(f"Invalid document entry for {filename}: {type(entry)}")
+
+        self._indexed_shas = {}
+        self._splitter = None  # built lazily; shared by full and incremental indexing
+        self._query_embed_cache = OrderedDict()  # query digest -> float16 vector
+        self._query_embed_lock = threading.Lock()
+        self._embed_batcher = None  # opt-in via enable_query_batching
         logger.info(f"VectorStoreManager initialized with {len(self.documents)} documents")
 
-    def process_pdf_content(self, content: bytes, filename: str) -> List[Document]:
-        """Process PDF content into Documents using PyMuPDF."""
+    @staticmethod
+    def _is_valid_entry(entry: Any) -> bool:
+        """Check that a document entry is raw bytes or a file-backed record."""
+        return isinstance(entry, bytes) or (isinstance(entry, dict) and "path" in entry)
+
+    def _get_content(self, filename: str) -> bytes:
+        """Return the raw bytes for a stored document, reading file-backed entries from disk."""
+        entry = self.documents[filename]
+        if isinstance(entry, bytes):
+            return entry
+        return Path(entry["path"]).read_bytes()
+
+    def _extract_pages_parallel(self, content: bytes, total_pages: int, filename: str) -> List[str]:
+        """Extract page text across a thread pool.
+
+        PyMuPDF releases the GIL inside its C extension, so extraction scales
+        with cores. A fitz.Document is not safe to share across threads, so
+        each worker opens its own handle over the same in-memory bytes.
+        """
+        import fitz
+
+        local = threading.local()
+        opened = []
+
+        def _extract(page_num: int) -> str:
+            doc = getattr(local, "doc", None)
+            if doc is None:
+                doc = fitz.open(stream=content, filetype="pdf")
+                local.doc = doc
+                opened.append(doc)
+            try:
+                return doc[page_num].get_text("text", sort=True, flags=fitz.TEXT_PRESERVE_WHITESPACE)
+            except Exception as e:
+                logger.error("Error processing page %d of %s: %s", page_num + 1, filename, e)
+                return ""
+
+        max_workers = min(os.cpu_count() or 1, PDF_MAX_WORKERS)
         try:
-            # Create document from bytes
-            pdf_document = fitz.open(stream=content, filetype="pdf")
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(_extract, range(total_pages)))
+        finally:
+            for doc in opened:
+                doc.close()
+
+    def iter_pdf_pages(self, content: bytes, filename: str) -> Iterator[Document]:
+        """Yield a Document per non-empty PDF page using PyMuPDF.
+
+        Pages are extracted and yielded lazily so callers can consume them
+        as they arrive instead of materializing every page list up front.
+        """
+        import fitz
+
+        with fitz.open(stream=content, filetype="pdf") as pdf_document:
+            # Bail out before any extraction work: locked documents would
+            # only yield empty text for every page
+            if pdf_document.needs_pass or pdf_document.is_encrypted:
+                logger.warning("Skipping encrypted PDF: %s", filename)
+                return
+
             total_pages = len(pdf_document)
             logger.info(f"Processing PDF {filename} with {total_pages} pages")
-            
-            documents = []
-            for page_num in range(total_pages):
-                try:
-                    # Get the page
-                    page = pdf_document[page_num]
-                    # Extract text from the page
-                    text = page.get_text("text")
-                    
-                    if text.strip():  # Only create document if text is not empty
-                        doc = Document(
-                            page_content=text,
-                            metadata={
-                                "source": filename,
-                                "page": page_num + 1,
-                                "total_pages": total_pages
-                            }
-                        )
-                        documents.append(doc)
-                        logger.info(f"Successfully processed page {page_num + 1} of {filename}")
-                    else:
-                        logger.warning(f"Empty text on page {page_num + 1} of {filename}")
-                        
-                except Exception as e:
-                    logger.error(f"Error processing page {page_num + 1} of {filename}: {str(e)}")
-                    continue
-            
-            pdf_document.close()
-            return documents
-            
-        except Exception as e:
-            logger.error(f"Error processing PDF {filename}: {str(e)}")
-            return []
+
+            if total_pages >= PDF_PARALLEL_THRESHOLD:
+                page_texts = self._extract_pages_parallel(content, total_pages, filename)
+            else:
+                def _page_texts():
+                    for page_num in range(total_pages):
+                        try:
+                            # sort=True with plain-text flags is faster than the
+                            # default extraction for pure text
+                            yield pdf_document[page_num].get_text(
+                                "text", sort=True, flags=fitz.TEXT_PRESERVE_WHITESPACE
+                            )
+                        except Exception as e:
+                            logger.error("Error processing page %d of %s: %s", page_num + 1, filename, e)
+                            yield ""
+                page_texts = _page_texts()
+
+            for page_num, text in enumerate(page_texts):
+                if text.strip():  # Only yield a document if text is not empty
+                    yield Document(
+                        page_content=text,
+                        metadata={
+                            "source": filename,
+                            "page": page_num + 1,
+                            "total_pages": total_pages
+                        }
+                    )
+                    logger.info("Successfully processed page %d of %s", page_num + 1, filename)
+                else:
+                    logger.warning("Empty text on page %d of %s", page_num + 1, filename)
 
     def reset(self):
         self.vectorstore = None
+        self._indexed_shas = {}
         logger.info("VectorStore reset")
 
     def process_text_content(self, content: bytes, filename: str) -> Document:
@@ -97,48 +327,63 @@ class VectorStoreManager:
             logger.error(f"Error decoding {filename}: {e}")
             return None
 
+    def _entry_sha(self, filename: str) -> str:
+        """Stable content hash for a stored document, used as its doc_id."""
+        entry = self.documents[filename]
+        if isinstance(entry, dict) and "sha" in entry:
+            return entry["sha"]
+        return hashlib.sha256(self._get_content(filename)).hexdigest()
+
+    def process_file(self, filename: str, content: bytes) -> Iterator[Document]:
+        """Yield Document objects for a single file based on its extension.
+
+        Every yielded document is tagged with the file's content hash as a
+        stable doc_id so chunks from one document can be identified later.
+        """
+        doc_id = self._entry_sha(filename)
+
+        if filename.lower().endswith('.pdf'):
+            # Handle PDFs with PyMuPDF, streaming pages through lazily
+            pages = 0
+            for doc in self.iter_pdf_pages(content, filename):
+                doc.metadata["doc_id"] = doc_id
+                pages += 1
+                yield doc
+            if pages:
+                logger.info(f"Successfully processed PDF: {filename} ({pages} pages)")
+            else:
+                logger.warning(f"Failed to process PDF: {filename}")
+
+        elif filename.lower().endswith(('.txt', '.csv')):
+            # Handle text files directly
+            doc = self.process_text_content(content, filename)
+            if doc:
+                doc.metadata["doc_id"] = doc_id
+                logger.info(f"Successfully processed text file: {filename}")
+                yield doc
+            else:
+                logger.warning(f"Failed to process text file: {filename}")
+
+        else:
+            logger.warning(f"Unsupported file type: {filename}")
+
     def load_documents(self) -> List[Document]:
         """Load all documents from memory into Document objects."""
         all_documents = []
-        
+
         if not self.documents:
             logger.warning("No documents to process")
             return all_documents
-            
-        for filename, content in self.documents.items():
+
+        for filename in self.documents:
             logger.info(f"Processing document: {filename}")
-            
-            if not isinstance(content, bytes):
-                logger.error(f"Invalid content type for {filename}: {type(content)}")
-                continue
-                
+
             try:
-                # Process based on file extension
-                if filename.lower().endswith('.pdf'):
-                    # Handle PDFs with PyMuPDF
-                    pdf_docs = self.process_pdf_content(content, filename)
-                    if pdf_docs:
-                        all_documents.extend(pdf_docs)
-                        logger.info(f"Successfully processed PDF: {filename} ({len(pdf_docs)} pages)")
-                    else:
-                        logger.warning(f"Failed to process PDF: {filename}")
-                
-                elif filename.lower().endswith(('.txt', '.csv')):
-                    # Handle text files directly
-                    doc = self.process_text_content(content, filename)
-                    if doc:
-                        all_documents.append(doc)
-                        logger.info(f"Successfully processed text file: {filename}")
-                    else:
-                        logger.warning(f"Failed to process text file: {filename}")
-                
-                else:
-                    logger.warning(f"Unsupported file type: {filename}")
-                    
+                all_documents.extend(self.process_file(filename, self._get_content(filename)))
             except Exception as e:
                 logger.error(f"Error processing {filename}: {str(e)}")
                 continue
-        
+
         num_docs = len(all_documents)
         if num_docs > 0:
             logger.info(f"Successfully loaded {num_docs} documents")
@@ -147,24 +392,175 @@ class VectorStoreManager:
             
         return all_documents
 
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in concurrent batches instead of one sequential pass.
+
+        Batches of EMBED_BATCH_SIZE texts are issued with up to
+        EMBED_CONCURRENCY requests in flight, so index builds overlap the
+        network latency of the embedding API.
+        """
+        batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+        if len(batches) <= 1:
+            return self.embeddings.embed_documents(texts)
+
+        async def _embed_all():
+            semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+            async def _embed_batch(batch):
+                async with semaphore:
+                    return await self.embeddings.aembed_documents(batch)
+
+            results = await asyncio.gather(*(_embed_batch(batch) for batch in batches))
+            return [vector for batch_vectors in results for vector in batch_vectors]
+
+        try:
+            return asyncio.run(_embed_all())
+        except RuntimeError:
+            # Already inside an event loop; fall back to the synchronous path
+            logger.info("Event loop already running, embedding sequentially")
+            return self.embeddings.embed_documents(texts)
+
+    def _build_index(self, vectors: np.ndarray) -> "faiss.Index":
+        """Build the FAISS index used to back the vector store.
+
+        Small corpora keep an exact flat index; moderate ones get an HNSW
+        graph over fp16 scalar-quantized vectors (half the memory of fp32
+        at negligible recall loss); large corpora switch to HNSW over
+        product-quantized codes, trained on the corpus vectors, trading
+        ~2% recall for a 4-8x memory cut.
+        """
+        import faiss
+
+        num_vectors, dim = vectors.shape
+        if num_vectors < HNSW_THRESHOLD:
+            logger.info(f"Building flat index for {num_vectors} vectors (dim={dim})")
+            index = faiss.IndexFlatL2(dim)
+        elif num_vectors >= PQ_THRESHOLD and dim % PQ_M == 0:
+            logger.info(f"Building HNSW-PQ index for {num_vectors} vectors (dim={dim})")
+            index = faiss.IndexHNSWPQ(dim, PQ_M, HNSW_M)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+            index.train(vectors)
+        else:
+            logger.info(f"Building HNSW-SQfp16 index for {num_vectors} vectors (dim={dim})")
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_fp16, HNSW_M)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+            index.train(vectors)
+        return index
+
+    def _corpus_key(self) -> str:
+        """Content hash of the document set plus embedding model.
+
+        Keys the on-disk index cache; any change to a file, a filename or
+        the embedding model produces a new key, so stale indexes are never
+        loaded.
+        """
+        digest = hashlib.sha256()
+        for filename in sorted(self.documents):
+            digest.update(filename.encode())
+            digest.update(self._entry_sha(filename).encode())
+        base = getattr(self.embeddings, "underlying_embeddings", self.embeddings)
+        digest.update(str(getattr(base, "model", "")).encode())
+        return digest.hexdigest()
+
+    def _load_cached_vectorstore(self) -> bool:
+        """Load a previously built index for this exact corpus, if one exists."""
+        from langchain_community.vectorstores import FAISS
+
+        try:
+            cache_dir = VECTORSTORE_CACHE_DIR / self._corpus_key()
+            if not (cache_dir / "index.faiss").exists():
+                return False
+            self.vectorstore = FAISS.load_local(
+                str(cache_dir),
+                self.embeddings,
+                allow_dangerous_deserialization=True
+            )
+            if hasattr(self.vectorstore.index, "hnsw"):
+                self.vectorstore.index.hnsw.efSearch = HNSW_EF_SEARCH
+            self._indexed_shas = {name: self._entry_sha(name) for name in self.documents}
+            logger.info(f"Loaded cached vector store from {cache_dir}")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not load cached vector store: {str(e)}")
+            return False
+
+    def _save_vectorstore(self) -> None:
+        """Persist the built index under its corpus key."""
+        try:
+            cache_dir = VECTORSTORE_CACHE_DIR / self._corpus_key()
+            self.vectorstore.save_local(str(cache_dir))
+            logger.info(f"Saved vector store to {cache_dir}")
+        except Exception as e:
+            logger.warning(f"Could not save vector store: {str(e)}")
+
+    def _split_documents(self, docs: List[Document]) -> List[Document]:
+        """Chunk documents with the shared token-aware splitter.
+
+        Chunk boundaries are measured in the embedding model's own tokens
+        rather than characters, so every chunk lands inside the embedder's
+        window with predictable cost. Runt chunks below SPLIT_MIN_TOKENS
+        are merged into the preceding chunk from the same source and page
+        instead of being embedded on their own.
+        """
+        if self._splitter is None:
+            self._splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+                model_name="text-embedding-3-small",
+                chunk_size=SPLIT_CHUNK_TOKENS,
+                chunk_overlap=SPLIT_OVERLAP_TOKENS,
+                separators=["\n\n", "\n", ". ", " ", ""],
+            )
+        splits = self._splitter.split_documents(docs)
+
+        # ~4 chars/token lets us spot runts without re-encoding every chunk
+        min_chars = SPLIT_MIN_TOKENS * 4
+        merged: List[Document] = []
+        for split in splits:
+            prev = merged[-1] if merged else None
+            if (
+                prev is not None
+                and len(split.page_content) < min_chars
+                and prev.metadata.get("source") == split.metadata.get("source")
+                and prev.metadata.get("page") == split.metadata.get("page")
+            ):
+                prev.page_content += "\n" + split.page_content
+            else:
+                merged.append(split)
+        return merged
+
     def create_vectorstore(self) -> bool:
         """Create a vector store from the loaded documents."""
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+
         try:
+            if self._load_cached_vectorstore():
+                return True
+
             docs = self.load_documents()
             if not docs:
                 logger.warning("No documents were loaded")
                 return False
 
             logger.info("Splitting documents into chunks...")
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            splits = text_splitter.split_documents(docs)
+            splits = self._split_documents(docs)
             logger.info(f"Created {len(splits)} chunks from {len(docs)} documents")
 
             logger.info("Creating vector store...")
-            self.vectorstore = FAISS.from_documents(splits, self.embeddings)
+            texts = [split.page_content for split in splits]
+            metadatas = [split.metadata for split in splits]
+            vectors = self._embed_texts(texts)
+            index = self._build_index(np.ascontiguousarray(vectors, dtype="float32"))
+            self.vectorstore = FAISS(
+                embedding_function=self.embeddings,
+                index=index,
+                docstore=InMemoryDocstore({}),
+                index_to_docstore_id={}
+            )
+            self.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+            self._indexed_shas = {name: self._entry_sha(name) for name in self.documents}
+            self._save_vectorstore()
             logger.info("Vector store created successfully")
             return True
 
@@ -172,59 +568,267 @@ class VectorStoreManager:
             logger.error(f"Error creating vector store: {str(e)}")
             return False
 
+    def add_documents(self, new_documents: Dict[str, Any]) -> bool:
+        """Incrementally chunk and embed new documents into the existing vector store.
+
+        Only the newly supplied files are processed, avoiding a full rebuild
+        of the index on every upload.
+        """
+        if self.vectorstore is None:
+            logger.info("No existing vector store; performing full build")
+            for filename, entry in new_documents.items():
+                self.documents[filename] = entry
+            return self.create_vectorstore()
+
+        new_docs = []
+        for filename, entry in new_documents.items():
+            if not self._is_valid_entry(entry):
+                logger.error(f"Invalid document entry for {filename}: {type(entry)}")
+                continue
+
+            indexed_sha = self._indexed_shas.get(filename)
+            self.documents[filename] = entry
+            new_sha = self._entry_sha(filename)
+            if indexed_sha == new_sha:
+                logger.info(f"Skipping already indexed document: {filename}")
+                continue
+            if indexed_sha is not None:
+                # Same name, new content: drop the stale chunks first so
+                # the index never keeps serving the old version
+                logger.info(f"Re-indexing modified document: {filename}")
+                if not self._delete_document_chunks(indexed_sha):
+                    logger.info("Index does not support deletion; rebuilding")
+                    return self.create_vectorstore()
+
+            try:
+                new_docs.extend(self.process_file(filename, self._get_content(filename)))
+                self._indexed_shas[filename] = new_sha
+            except Exception as e:
+                logger.error(f"Error processing {filename}: {str(e)}")
+                continue
+
+        if not new_docs:
+            logger.info("No new documents to index")
+            return True
+
+        try:
+            splits = self._split_documents(new_docs)
+            logger.info(f"Adding {len(splits)} chunks from {len(new_docs)} new documents")
+            self.vectorstore.add_documents(splits)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error adding documents to vector store: {str(e)}")
+            return False
+
+    def _delete_document_chunks(self, doc_id: str) -> bool:
+        """Remove every chunk tagged with the given doc_id from the store.
+
+        Returns False when the chunks cannot be removed in place (e.g. the
+        HNSW tier does not support deletion), signalling the caller to fall
+        back to a full rebuild.
+        """
+        store = getattr(self.vectorstore.docstore, "_dict", None)
+        if store is None:
+            return False
+        stale = [sid for sid, doc in store.items()
+                 if doc.metadata.get("doc_id") == doc_id]
+        if not stale:
+            return True
+        try:
+            self.vectorstore.delete(stale)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not delete stale chunks: {str(e)}")
+            return False
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query through a bounded in-memory LRU.
+
+        Repeat queries are served from float16 vectors held in memory,
+        skipping even the disk-backed embedding cache's store read. The
+        cache is capped at QUERY_EMBED_CACHE_SIZE entries with LRU
+        eviction.
+        """
+        key = hashlib.blake2b(query.encode(), digest_size=16).digest()
+        with self._query_embed_lock:
+            cached = self._query_embed_cache.get(key)
+            if cached is not None:
+                self._query_embed_cache.move_to_end(key)
+                return cached.astype("float32").tolist()
+
+        if self._embed_batcher is not None:
+            vector = self._embed_batcher.embed(query)
+        else:
+            vector = self.embeddings.embed_query(query)
+        with self._query_embed_lock:
+            self._query_embed_cache[key] = np.asarray(vector, dtype="float16")
+            while len(self._query_embed_cache) > QUERY_EMBED_CACHE_SIZE:
+                self._query_embed_cache.popitem(last=False)
+        return vector
+
+    def enable_query_batching(self) -> None:
+        """Route query embeddings through the micro-batcher.
+
+        Opt-in because only concurrent callers (the Slack bot) benefit;
+        the single-user Streamlit path would just pay the window.
+        """
+        if self._embed_batcher is None:
+            self._embed_batcher = EmbedBatcher(self.embeddings)
+
     def search_local_documents(self, query: str) -> List[Document]:
         """Search the vector store for relevant documents."""
         if self.vectorstore:
-            # Use hybrid search approach
-            results = []
-            
+            # Embed the query once and reuse the vector for both passes,
+            # halving query-time embedding calls
+            query_vector = self.embed_query(query)
+
             # Get more results with MMR for diversity
-            mmr_results = self.vectorstore.max_marginal_relevance_search(
-                query,
+            results = self.vectorstore.max_marginal_relevance_search_by_vector(
+                query_vector,
                 k=20,  # Get more chunks
                 fetch_k=40,  # Consider more candidates
                 lambda_mult=0.5  # Increase diversity
             )
-            results.extend(mmr_results)
-            
-            # Also get similarity results
-            similarity_results = self.vectorstore.similarity_search(
-                query,
-                k=10,
-                score_threshold=0.5  # Lower threshold to get more matches
+
+            # Also get similarity results over the same vector
+            similarity_results = self.vectorstore.similarity_search_by_vector(
+                query_vector,
+                k=10
             )
             
-            # Combine results, removing duplicates
-            seen_contents = {doc.page_content for doc in results}
+            # Combine results, removing duplicates. Dedup on short content
+            # digests rather than holding every chunk's full text in a set
+            def _fp(doc: Document) -> bytes:
+                return hashlib.blake2b(doc.page_content.encode(), digest_size=8).digest()
+
+            seen_contents = {_fp(doc) for doc in results}
             for doc in similarity_results:
-                if doc.page_content not in seen_contents:
+                fp = _fp(doc)
+                if fp not in seen_contents:
                     results.append(doc)
-                    seen_contents.add(doc.page_content)
+                    seen_contents.add(fp)
             
-            # Log retrieved content
-            logger.info(f"Retrieved {len(results)} total documents")
-            for doc in results:
-                logger.info(f"Source: {doc.metadata.get('source')}, Page: {doc.metadata.get('page')}")
-                logger.info(f"Content preview: {doc.page_content[:200]}...")
+            # Log retrieved content; the per-document previews slice and
+            # format every chunk, so skip the loop entirely when INFO is off
+            logger.info("Retrieved %d total documents", len(results))
+            if logger.isEnabledFor(logging.INFO):
+                for doc in results:
+                    logger.info("Source: %s, Page: %s", doc.metadata.get('source'), doc.metadata.get('page'))
+                    logger.info("Content preview: %.200s...", doc.page_content)
             
             return results
         return []
 
 
 class VerboseHandler(BaseCallbackHandler):
+    """Callback logging with lazy %-formatting so the payloads these
+    hooks receive are only stringified when INFO is actually emitted."""
+
     def on_tool_start(self, serialized, input_str, **kwargs):
-        logger.info(f"RAGSystem: Starting tool: {serialized['name']}")
-        logger.info(f"RAGSystem: Tool input: {input_str}")
+        logger.info("RAGSystem: Starting tool: %s", serialized['name'])
+        logger.info("RAGSystem: Tool input: %s", input_str)
 
     def on_tool_end(self, output, **kwargs):
-        logger.info(f"RAGSystem: Tool output: {output}")
+        logger.info("RAGSystem: Tool output: %s", output)
 
     def on_chain_start(self, serialized, inputs, **kwargs):
-        logger.info(f"RAGSystem: Starting chain: {serialized['name']}")
-        logger.info(f"RAGSystem: Chain input: {inputs}")
+        logger.info("RAGSystem: Starting chain: %s", serialized['name'])
+        logger.info("RAGSystem: Chain input: %s", inputs)
 
     def on_chain_end(self, outputs, **kwargs):
-        logger.info(f"RAGSystem: Chain output: {outputs}")
+        logger.info("RAGSystem: Chain output: %s", outputs)
+
+
+# Semantic cache LSH shape: K sign bits per table bound how selective a
+# bucket is, L tables bound how many chances a near-neighbor gets to
+# collide. 8x16 keeps lookups to a handful of candidates while catching
+# paraphrases that land on different sides of a single hyperplane
+LSH_PLANES = 8
+LSH_TABLES = 16
+
+
+class SemanticCache:
+    """Embedding-based response cache for repeated questions.
+
+    Returns a previously generated answer when a new query's embedding is
+    within `threshold` cosine similarity of a cached query, skipping both
+    retrieval and generation entirely. Lookup hashes the embedding with
+    random-projection LSH — the signs of projections onto K random ±1
+    hyperplanes, packed into an integer bucket key per table — and only
+    candidates sharing a bucket are verified with an exact dot product,
+    so the common miss touches no stored vectors at all.
+    """
+
+    def __init__(self, embeddings, threshold: float = 0.95, ttl: int = 3600, max_entries: int = 256):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._planes = None  # (LSH_TABLES * LSH_PLANES, dim), drawn on first insert
+        self._buckets = {}  # (table, packed signs) -> [entry indices]
+        self._entries = []  # (vector, response, stored_at)
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng()
+
+    def _embed(self, query: str) -> np.ndarray:
+        """Embed and L2-normalize a query so dot product equals cosine similarity."""
+        vector = np.asarray(self.embeddings.embed_query(query), dtype="float32")
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def _bucket_keys(self, vector: np.ndarray) -> List[int]:
+        """Pack the per-table projection signs into one integer key per table."""
+        signs = (self._planes @ vector > 0).reshape(LSH_TABLES, LSH_PLANES)
+        powers = 1 << np.arange(LSH_PLANES)
+        return [int(key) for key in signs @ powers]
+
+    def get(self, query: str) -> Optional[str]:
+        """Return a cached response for a semantically equivalent query, if any."""
+        if not self._entries:
+            return None
+        vector = self._embed(query)
+        now = time.time()
+        with self._lock:
+            if self._planes is None:
+                return None
+            best_score = self.threshold
+            best_response = None
+            seen = set()
+            for table, key in enumerate(self._bucket_keys(vector)):
+                for idx in self._buckets.get((table, key), ()):
+                    if idx in seen:
+                        continue
+                    seen.add(idx)
+                    cached_vector, response, stored_at = self._entries[idx]
+                    if now - stored_at > self.ttl:
+                        continue
+                    score = float(np.dot(cached_vector, vector))
+                    if score >= best_score:
+                        best_score = score
+                        best_response = response
+            if best_response is not None:
+                logger.info("Semantic cache hit (similarity=%.3f)", best_score)
+            return best_response
+
+    def set(self, query: str, response: str) -> None:
+        """Cache a response under the query's embedding."""
+        vector = self._embed(query)
+        with self._lock:
+            if self._planes is None:
+                self._planes = self._rng.choice(
+                    [-1.0, 1.0], size=(LSH_TABLES * LSH_PLANES, vector.shape[0])
+                ).astype("float32")
+            if len(self._entries) >= self.max_entries:
+                # Simple wholesale eviction; entries also expire via TTL
+                self._buckets = {}
+                self._entries = []
+            idx = len(self._entries)
+            self._entries.append((vector, response, time.time()))
+            for table, key in enumerate(self._bucket_keys(vector)):
+                self._buckets.setdefault((table, key), []).append(idx)
 
 
 class DocumentWithGrade(BaseModel):
@@ -242,13 +846,22 @@ class GraphState(TypedDict):
 
 
 class RAGSystem:
-    def __init__(self, documents: Dict[str, bytes], credentials: Dict[str, str]):
+    def __init__(self, documents: Dict[str, Any], credentials: Dict[str, str], embeddings=None, llm=None):
+        from langchain_community.chat_models import ChatOpenAI
+
         self.documents = documents
         self.credentials = credentials
-        self.vectorstore_manager = VectorStoreManager(documents, credentials)
-        self.llm = ChatOpenAI(model_name="gpt-4", api_key=credentials["OPENAI_API_KEY"])
+        self.vectorstore_manager = VectorStoreManager(documents, credentials, embeddings=embeddings)
+        self.llm = llm or ChatOpenAI(
+            model_name="gpt-4",
+            api_key=credentials["OPENAI_API_KEY"],
+            streaming=True,
+            http_client=shared_http_client(),
+        )
         self.workflow = None
         self._initialized = False
+        self._retrieval_cache = OrderedDict()  # query -> (documents, stored_at)
+        self._retrieval_lock = threading.Lock()
         self._default_prompt = """<persona>
 You are Patrick, a sophisticated AI assistant with the warmth of a close friend and the precision of a scholar. Your responses combine deep knowledge with genuine empathy, making complex information accessible and engaging.
 
@@ -288,16 +901,21 @@ Core Attributes:
 - Format appropriately for Slack
 </output_guidelines>"""
         self._current_prompt = self._default_prompt
+        # Persona goes out as a prebuilt SystemMessage, constructed once per
+        # prompt change instead of being re-concatenated into every request
+        self._system_message = SystemMessage(content=self._current_prompt)
 
     def update_prompt(self, new_prompt: str) -> None:
         """Update the assistant's prompt template."""
         logger.info("Updating assistant prompt template")
         self._current_prompt = new_prompt
+        self._system_message = SystemMessage(content=new_prompt)
 
     def reset_prompt(self) -> None:
         """Reset the prompt to the default Patrick personality."""
         logger.info("Resetting assistant prompt to default")
         self._current_prompt = self._default_prompt
+        self._system_message = SystemMessage(content=self._default_prompt)
 
     def initialize_system(self) -> bool:
         """Initialize the RAG system with documents."""
@@ -307,6 +925,7 @@ Core Attributes:
                 logger.info("Successfully created vector store")
                 self.workflow = self.create_workflow()
                 self._initialized = True
+                self._invalidate_retrieval_cache()
                 return True
             else:
                 logger.warning("No documents were processed into the vector store")
@@ -317,6 +936,30 @@ Core Attributes:
             self._initialized = False
             return False
 
+    def add_documents(self, new_documents: Dict[str, Any]) -> bool:
+        """Index newly uploaded documents without rebuilding the whole store."""
+        if not self.is_initialized():
+            self.documents.update(new_documents)
+            return self.initialize_system()
+        try:
+            self.documents.update(new_documents)
+            added = self.vectorstore_manager.add_documents(new_documents)
+            if added:
+                self._invalidate_retrieval_cache()
+            return added
+        except Exception as e:
+            logger.error(f"Error adding documents: {str(e)}")
+            return False
+
+    def _invalidate_retrieval_cache(self) -> None:
+        """Drop cached retrievals after the index changes."""
+        with self._retrieval_lock:
+            self._retrieval_cache.clear()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query with the same embedder used for the vector store."""
+        return self.vectorstore_manager.embed_query(text)
+
     def is_initialized(self) -> bool:
         """Check if the RAG system is initialized."""
         return (self._initialized and 
@@ -324,7 +967,7 @@ Core Attributes:
                 self.vectorstore_manager.vectorstore is not None)
 
     def google_search(self, search_term: str, num_results: int = 3) -> list:
-        service = build("customsearch", "v1", developerKey=self.credentials["GOOGLE_API_KEY"])
+        service = _cse_service(self.credentials["GOOGLE_API_KEY"])
         res = service.cse().list(q=search_term, cx=self.credentials["GOOGLE_CSE_ID"], num=num_results).execute()
         items = res.get("items", [])
         return [{"title": item["title"], "snippet": item["snippet"], "link": item["link"]} for item in items]
@@ -338,15 +981,38 @@ Core Attributes:
         try:
             query = state["query"]
             logger.info(f"Retrieving documents for query: {query}")
-            
+
+            # Repeat queries skip the vector search; entries expire on TTL
+            # and the whole cache is dropped when the index changes
+            with self._retrieval_lock:
+                entry = self._retrieval_cache.get(query)
+                if entry is not None:
+                    cached_docs, stored_at = entry
+                    if time.time() - stored_at <= RETRIEVAL_CACHE_TTL:
+                        self._retrieval_cache.move_to_end(query)
+                        logger.info("Retrieval cache hit (%d documents)", len(cached_docs))
+                        return {
+                            "query": query,
+                            "documents": list(cached_docs),
+                            "web_results": []
+                        }
+                    del self._retrieval_cache[query]
+
             # Use our working vectorstore search
             docs = self.vectorstore_manager.search_local_documents(query)
-            
+
+            with self._retrieval_lock:
+                self._retrieval_cache[query] = (list(docs), time.time())
+                while len(self._retrieval_cache) > RETRIEVAL_CACHE_SIZE:
+                    self._retrieval_cache.popitem(last=False)
+
             if docs:
-                # Log the actual content being retrieved
-                for doc in docs:
-                    logger.info(f"Retrieved document content: {doc.page_content[:100]}...")
-                logger.info(f"Found {len(docs)} relevant documents")
+                # Log the actual content being retrieved, skipping the
+                # per-chunk slicing when INFO is disabled
+                if logger.isEnabledFor(logging.INFO):
+                    for doc in docs:
+                        logger.info("Retrieved document content: %.100s...", doc.page_content)
+                logger.info("Found %d relevant documents", len(docs))
             else:
                 logger.info("No relevant documents found")
             
@@ -378,24 +1044,22 @@ Core Attributes:
 
         # Keep all documents by default, only filter out completely irrelevant ones
         filtered_docs = []
+        query_terms = set(question.lower().split())  # lower/split once, not per document
         for doc in documents:
-            # Extract key terms from document
             doc_text = doc.page_content.lower()
-            query_terms = set(question.lower().split())
-            
+
             # Check if document contains any query terms or is from first few pages
             is_relevant = (
                 doc.metadata.get("page", 0) <= 5 or  # Keep intro pages
                 any(term in doc_text for term in query_terms) or  # Contains query terms
-                "spiritual" in doc_text or "machine" in doc_text or  # Topic-specific terms
-                "consciousness" in doc_text or "intelligence" in doc_text  # Related concepts
+                _TOPIC_RE.search(doc_text) is not None  # Topic-specific terms
             )
             
             if is_relevant:
                 filtered_docs.append(doc)
-                logger.info(f"Keeping relevant document from page {doc.metadata.get('page')}")
+                logger.info("Keeping relevant document from page %s", doc.metadata.get('page'))
             else:
-                logger.info(f"Filtering out document from page {doc.metadata.get('page')}")
+                logger.info("Filtering out document from page %s", doc.metadata.get('page'))
 
         web_search_needed = "Yes" if len(filtered_docs) < 5 else "No"
         
@@ -407,9 +1071,9 @@ Core Attributes:
 
     def rewrite_query(self, state: Dict[str, Any]) -> Dict[str, Any]:
         query = state["query"]
-        rewritten_query = self.llm.predict(
+        rewritten_query = self.llm.invoke(
             f"Rewrite this query for web search to find the most relevant information: {query}"
-        )
+        ).content
         return {"query": query, "rewritten_query": rewritten_query}
 
     def web_search(self, state: Dict[str, Any]) -> Dict[str, Any]:
@@ -431,31 +1095,30 @@ Core Attributes:
         if not isinstance(web_results, list):
             web_results = []
 
-        # Enhanced context preparation with metadata and better organization
-        doc_contexts = []
-        seen_pages = set()  # Track unique pages to avoid duplicates
-        
-        # Group documents by source
-        docs_by_source = {}
+        # Group documents in one pass: the inner dict keyed by page both
+        # collects and deduplicates, so each chunk is touched once and
+        # each source's pages are sorted a single time
+        docs_by_source = defaultdict(dict)
         for doc in documents:
-            metadata = doc.metadata
-            source = metadata.get("source", "Unknown")
-            if source not in docs_by_source:
-                docs_by_source[source] = []
-            docs_by_source[source].append(doc)
-
-        # Process each source's documents
-        for source, docs in docs_by_source.items():
-            source_contexts = []
-            for doc in sorted(docs, key=lambda x: x.metadata.get("page", 0)):
-                page = doc.metadata.get("page", "N/A")
-                page_key = f"{source}-{page}"
-                if page_key not in seen_pages:  # Avoid duplicate pages
-                    seen_pages.add(page_key)
-                    source_contexts.append(f"[Page {page}]: {doc.page_content.strip()}")
-            
-            if source_contexts:
-                doc_contexts.append(f"Source: {source}\n" + "\n\n".join(source_contexts))
+            source = doc.metadata.get("source", "Unknown")
+            page = doc.metadata.get("page", "N/A")
+            docs_by_source[source].setdefault(page, doc)
+
+        # Iterate sources in sorted order so the assembled context is
+        # byte-identical for identical retrievals regardless of result
+        # order — keeps any prefix cache on the LLM backend from thrashing
+        doc_contexts = []
+        unique_pages = 0
+        for source in sorted(docs_by_source):
+            pages = docs_by_source[source]
+            unique_pages += len(pages)
+            source_contexts = [
+                f"[Page {page}]: {doc.page_content.strip()}"
+                for page, doc in sorted(
+                    pages.items(), key=lambda kv: (isinstance(kv[0], str), kv[0])
+                )
+            ]
+            doc_contexts.append(f"Source: {source}\n" + "\n\n".join(source_contexts))
 
         # Join all contexts with clear separation
         doc_context = "\n\n---\n\n".join(doc_contexts) if doc_contexts else "No relevant documents found."
@@ -477,25 +1140,32 @@ Core Attributes:
 
         # Log the contexts being used
         logger.info(f"Document context length: {len(doc_context)}")
-        logger.info(f"Number of unique pages: {len(seen_pages)}")
+        logger.info(f"Number of unique pages: {unique_pages}")
         logger.info(f"Web context length: {len(web_context)}")
 
-        prompt = f"""{self._current_prompt}
+        # Assemble only the per-query portion here; the static persona
+        # rides along as the prebuilt system message
+        prompt = "\n".join([
+            "<input>",
+            f"Question: {query}",
+            "",
+            "Document Context:",
+            doc_context,
+            "",
+            "Web Results:",
+            web_context,
+            "</input>",
+            "",
+            "Please provide your response:",
+        ])
 
-<input>
-Question: {query}
-
-Document Context:
-{doc_context}
-
-Web Results:
-{web_context}
-</input>
-
-<CURRENT_CURSOR_POSITION>
-Please provide your response:</prompt>"""
-
-        answer = self.llm.predict(prompt)
+        # Stream the completion and accumulate chunks: time-to-first-token
+        # beats waiting on the full response, and the client keeps the
+        # connection busy instead of idling on one large payload
+        answer = "".join(
+            chunk.content
+            for chunk in self.llm.stream([self._system_message, HumanMessage(content=prompt)])
+        )
         return {
             "query": query,
             "documents": documents,
@@ -518,11 +1188,7 @@ Please provide your response:</prompt>"""
             not documents or
             web_search_needed == "Yes" or
             len(documents) < 3 or
-            any(keyword in query for keyword in [
-                "latest", "recent", "current", "new",
-                "compare", "vs", "versus", "difference",
-                "review", "today", "now", "update"
-            ])
+            not _WEB_TRIGGERS.isdisjoint(query.split())
         )
 
         if should_web_search:
@@ -533,6 +1199,8 @@ Please provide your response:</prompt>"""
         return "generate"
 
     def create_workflow(self):
+        from langgraph.graph import END, StateGraph
+
         workflow = StateGraph(GraphState)
 
         workflow.add_node("retrieve", self.retrieve_documents)
@@ -553,6 +1221,7 @@ Please provide your response:</prompt>"""
     def reset_system(self):
         self.vectorstore_manager.reset()
         self.workflow = None
+        self._invalidate_retrieval_cache()
 
     def process_query(self, query: str) -> str:
         if not self.is_initialized():
@@ -565,4 +1234,4 @@ Please provide your response:</prompt>"""
             return response.get("answer", "Sorry, I couldn't generate an answer.")
         except Exception as e:
             logger.error(f"RAGSystem: An error occurred: {e}")
-            return f"I apologize, but I encountered an error while processing your request. Please try again or contact support if the issue persists." 
\ No newline at end of file
+            return PROCESS_ERROR_RESPONSE
\ No newline at end of file
@@ -1,84 +1,434 @@
+import asyncio
+import hashlib
 import logging
+import sys
 import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 
-from slack_bolt import App
-from slack_bolt.adapter.socket_mode import SocketModeHandler
+from slack_bolt.adapter.socket_mode.aiohttp import AsyncSocketModeHandler
+from slack_bolt.async_app import AsyncApp
+
+from rag import PROCESS_ERROR_RESPONSE, RAGSystem, SemanticCache, logger
+
+# Executor sizing: eight workers cover the I/O-heavy RAG stages
+# (embedding, retrieval, LLM, Slack posts) across concurrent messages,
+# while the inflight semaphore caps how many full pipelines hit the LLM
+# endpoint at once
+RAG_MAX_WORKERS = 8
+RAG_MAX_INFLIGHT = 4
+
+# Replies landing in the same thread within this window are merged into
+# a single chat.postMessage round trip
+SEND_COALESCE_WINDOW = 0.05
+
+
+# Sent instead of running the pipeline while the circuit is open
+BREAKER_OPEN_MESSAGE = (
+    "I'm having trouble reaching my knowledge backend right now. "
+    "Please try again in a minute."
+)
+
+
+class CircuitBreaker:
+    """Minimal circuit breaker around the RAG pipeline.
+
+    Opens after fail_max consecutive failures and short-circuits calls
+    for reset_timeout seconds, then lets a single probe through. During
+    a backend outage this converts N workers each blocking for a full
+    timeout into one probe per cooldown window, keeping capacity free
+    for healthy traffic.
+    """
+
+    def __init__(self, fail_max: int = 5, reset_timeout: int = 30):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may proceed; half-opens after the cooldown."""
+        with self._lock:
+            if self._failures < self.fail_max:
+                return True
+            if self._probing:
+                # A probe is already in flight; everyone else stays
+                # short-circuited until it resolves
+                return False
+            if time.time() - self._opened_at >= self.reset_timeout:
+                # Half-open: exactly one probe gets through; success
+                # resets, failure reopens immediately
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._probing = False
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                self._opened_at = time.time()
+
+
+def _normalize(text: str) -> str:
+    """Collapse a query to one canonical, interned form.
+
+    Whitespace and case variants of the same question then share cache
+    keys across every cache layer, and interning means repeated FAQ-style
+    queries reuse one string object instead of allocating per message.
+    """
+    return sys.intern(" ".join(text.strip().lower().split()))
+
+
+class SmartRAGCache:
+    """Thread-safe exact-match LRU+TTL cache for full RAG responses.
+
+    Identical questions dominate Slack traffic once a team settles on a
+    bot; answering them from memory skips embedding, vector search and
+    the LLM call entirely. Entries are keyed by a digest of the
+    normalized query plus a config string so model changes invalidate,
+    and evicted by LRU order when either the entry count or the byte
+    budget is exceeded. hits/misses/evictions counters are exposed for
+    observability.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: int = 900, max_bytes: int = 100 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (response, stored_at, size)
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query: str, config: str = "") -> str:
+        digest = hashlib.blake2b(query.strip().lower().encode())
+        digest.update(config.encode())
+        return digest.hexdigest()
+
+    def get_or_compute(self, key: str, compute):
+        """Return the cached response for key, computing and storing on miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, stored_at, size = entry
+                if time.time() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+                self._bytes -= size
+            self.misses += 1
+
+        # Compute outside the lock so one slow pipeline run doesn't
+        # serialize every other cache access
+        response = compute()
+        if response:
+            size = sys.getsizeof(response)
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = (response, time.time(), size)
+                    self._bytes += size
+                    while self._entries and (
+                        len(self._entries) > self.maxsize or self._bytes > self.max_bytes
+                    ):
+                        _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                        self._bytes -= evicted_size
+                        self.evictions += 1
+        return response
+
+
+# Shared across bot restarts within one process so a reconnect doesn't
+# drop the warm cache
+response_cache = SmartRAGCache()
 
-from rag import RAGSystem, logger
 
 class SlackBot:
-    def __init__(self, rag_system, credentials):
+    def __init__(self, rag_system, credentials, prompt_prefix: str = None):
         self.rag_system = rag_system
         self.credentials = credentials
+        # Optional stable system prefix; applied once at startup so every
+        # request shares a byte-identical prompt head, which lets backends
+        # with automatic prefix caching reuse their KV cache across queries
+        self.prompt_prefix = prompt_prefix
         self.app = None
         self.handler = None
         self.thread = None
         self._running = False
+        self._semantic_cache = None
+        self._loop = None
+        self._executor = None
+        self._inflight = threading.Semaphore(RAG_MAX_INFLIGHT)
+        # Readiness is a single atomic Event read on the message hot path,
+        # set once at startup instead of re-probing the RAG system per event
+        self._ready_flag = threading.Event()
+        # Token formats never change after construction; check them once
+        self._tokens_valid = (
+            credentials["SLACK_BOT_TOKEN"].startswith("xoxb-")
+            and credentials["SLACK_APP_TOKEN"].startswith("xapp-")
+        )
+        # Recently seen client_msg_ids, so Slack redeliveries and retry
+        # storms never run the pipeline twice for one message
+        self._seen_msg_ids = deque(maxlen=1024)
+        self._seen_lock = threading.Lock()
+        # Key cache entries to the generating model so a config change
+        # never serves answers produced by a different LLM
+        self._cache_config = str(getattr(getattr(rag_system, "llm", None), "model_name", ""))
+        self._send_queue = None
+        self._send_task = None
+        # In-flight computations by cache key: concurrent identical
+        # queries attach to one pipeline run instead of racing N copies
+        self._inflight_futures = {}
+        self._inflight_lock = threading.Lock()
+        self._breaker = CircuitBreaker()
+
+    def _shared_response(self, key: str, text: str):
+        """Return a Future for the response, singleflight-style.
+
+        If an identical query is already being computed, later arrivals
+        wait on the same Future; otherwise one executor job is submitted
+        and registered until it completes. A cold-cache burst of the same
+        question costs one pipeline run instead of N.
+        """
+        with self._inflight_lock:
+            fut = self._inflight_futures.get(key)
+            if fut is not None:
+                return fut
+            fut = self._executor.submit(
+                response_cache.get_or_compute, key, lambda: self._run_pipeline(text)
+            )
+            self._inflight_futures[key] = fut
+
+        def _done(_f, _k=key):
+            with self._inflight_lock:
+                self._inflight_futures.pop(_k, None)
+
+        # Registered outside the lock: if the future already finished,
+        # add_done_callback runs _done synchronously in this thread, and
+        # doing that while holding the non-reentrant lock would deadlock
+        fut.add_done_callback(_done)
+        return fut
+
+    def _queue_send(self, say, text: str, thread_ts=None) -> None:
+        """Hand a reply to the writer task instead of posting inline."""
+        self._send_queue.put_nowait((say, text, thread_ts))
+
+    async def _send_worker(self):
+        """Drain queued replies through one writer task.
+
+        Posting from a dedicated task overlaps outbound Slack I/O with
+        handling of the next inbound event, and multiple chunks aimed at
+        the same thread within the coalescing window collapse into a
+        single post.
+        """
+        while True:
+            batch = [await self._send_queue.get()]
+            deadline = self._loop.time() + SEND_COALESCE_WINDOW
+            while True:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._send_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Coalesce by thread; unthreaded replies stay separate because
+            # each say() is bound to its own channel
+            grouped = OrderedDict()
+            for say, text, thread_ts in batch:
+                key = thread_ts if thread_ts else object()
+                grouped.setdefault(key, (say, thread_ts, []))[2].append(text)
+
+            for say, thread_ts, texts in grouped.values():
+                body = "\n\n".join(texts)
+                try:
+                    if thread_ts:
+                        await say(text=body, thread_ts=thread_ts)
+                    else:
+                        await say(body)
+                except Exception as e:
+                    logger.error("Error sending Slack reply: %s", e)
+
+    def _is_duplicate(self, message) -> bool:
+        """Record and detect redelivered messages by client_msg_id."""
+        msg_id = message.get("client_msg_id")
+        if not msg_id:
+            return False
+        with self._seen_lock:
+            if msg_id in self._seen_msg_ids:
+                return True
+            self._seen_msg_ids.append(msg_id)
+            return False
 
-    def _handle_direct_message(self, message, say):
+    def _run_pipeline(self, text: str) -> str:
+        """Run the full RAG pipeline under the inflight cap.
+
+        The executor lets messages overlap their I/O, but each full
+        pipeline ends in an LLM call; the semaphore bounds how many of
+        those run simultaneously. Outcomes feed the circuit breaker, and
+        failures raise so error text is never stored in the response
+        cache.
+        """
+        try:
+            with self._inflight:
+                response = self.rag_system.process_query(text)
+        except Exception:
+            self._breaker.record_failure()
+            raise
+        if response == PROCESS_ERROR_RESPONSE:
+            self._breaker.record_failure()
+            raise RuntimeError("RAG pipeline reported a processing error")
+        self._breaker.record_success()
+        return response
+
+    async def _handle_direct_message(self, message, say):
         """Handle direct messages to the bot.
-        
+
         Attempts to use the LangGraph workflow first, falls back to simple
-        processing if needed.
+        processing if needed. Blocking RAG work runs in the executor so the
+        event loop stays free to accept the next event.
         """
         try:
-            logger.info(f"Received DM: {message['text']}")
-            
-            if not self.rag_system.is_initialized():
+            # Log sizes, not content: pasted prompts and multi-KB answers
+            # otherwise get copied into every log line even when the
+            # handler's sink is slow or INFO is filtered downstream
+            logger.info("Received DM (%d chars)", len(message['text']))
+
+            if not self._ready_flag.is_set():
                 logger.warning("RAG system not initialized")
-                say("The knowledge base is not initialized. Please upload documents first.")
+                await say("The knowledge base is not initialized. Please upload documents first.")
+                return
+
+            # Normalize once; every cache layer and the pipeline see the
+            # same canonical string
+            text = _normalize(message['text'])
+            loop = asyncio.get_running_loop()
+
+            # Serve repeated (semantically equivalent) questions from cache,
+            # skipping retrieval and generation entirely
+            if self._semantic_cache:
+                cached = await loop.run_in_executor(
+                    self._executor, self._semantic_cache.get, text
+                )
+                if cached is not None:
+                    logger.info("Returning semantically cached response")
+                    self._queue_send(say, cached)
+                    return
+
+            # While the breaker is open, apologize instead of queueing
+            # more doomed backend calls; cache hits above still serve
+            if not self._breaker.allow():
+                logger.warning("Circuit breaker open; short-circuiting query")
+                self._queue_send(say, BREAKER_OPEN_MESSAGE)
                 return
-            
-            # Try LangGraph workflow first
+
+            # Try LangGraph workflow first; identical queries come straight
+            # out of the exact-match cache
             try:
-                response = self.rag_system.process_query(message['text'])
+                cache_key = response_cache.make_key(text, self._cache_config)
+                response = await asyncio.wrap_future(self._shared_response(cache_key, text))
                 if response:
                     logger.info("Successfully used LangGraph workflow")
-                    say(response)
+                    if self._semantic_cache:
+                        await loop.run_in_executor(
+                            self._executor, self._semantic_cache.set, text, response
+                        )
+                    self._queue_send(say, response)
                     return
             except Exception as e:
-                logger.warning(f"LangGraph workflow failed, falling back to simple processing: {str(e)}")
-            
+                logger.warning("LangGraph workflow failed, falling back to simple processing: %s", e)
+
             # Fallback to simple processing
-            response = self.rag_system.process_message(message['text'])
+            response = await loop.run_in_executor(
+                self._executor, self.rag_system.process_message, text
+            )
             logger.info("Used fallback processing")
-            say(response)
-            
+            self._queue_send(say, response)
+
         except Exception as e:
-            logger.error(f"Error handling message: {str(e)}")
-            say("I encountered an error processing your message. Please try again.")
+            logger.error("Error handling message: %s", e)
+            self._queue_send(say, "I encountered an error processing your message. Please try again.")
 
     def start(self) -> bool:
-        """Start the Slack bot."""
+        """Start the Slack bot.
+
+        The socket connection and all handlers run on one asyncio loop:
+        concurrent events interleave on that loop instead of paying a
+        thread/GIL handoff per message. Streamlit owns the main thread
+        and runs no loop of its own, so the loop lives on a single
+        background thread.
+        """
         try:
             if not self.rag_system.is_initialized():
                 logger.error("Cannot start bot: RAG system not initialized")
                 return False
 
-            # Create the Bolt app
-            self.app = App(token=self.credentials["SLACK_BOT_TOKEN"])
-            
-            # Register message handler
-            @self.app.message("")
-            def message_handler(message, say):
-                self._handle_direct_message(message, say)
-            
+            # Reuse the RAG embedder for the semantic response cache; the
+            # manager routes through its in-memory query-embedding LRU
+            self._semantic_cache = SemanticCache(self.rag_system.vectorstore_manager)
+
+            # Concurrent DMs arriving together share one embedding request
+            self.rag_system.vectorstore_manager.enable_query_batching()
+
+            # Pin the custom prefix before any traffic; changing it
+            # per-request would defeat backend prefix caching
+            if self.prompt_prefix:
+                self.rag_system.update_prompt(self.prompt_prefix)
+
+            # Blocking RAG calls are pushed here via run_in_executor
+            self._executor = ThreadPoolExecutor(
+                max_workers=RAG_MAX_WORKERS, thread_name_prefix="sage-rag"
+            )
+
+            # Create the Bolt app; all listeners live in register_listeners
+            # so each message matches exactly one handler
+            self.app = AsyncApp(token=self.credentials["SLACK_BOT_TOKEN"])
+            self.register_listeners()
+
             # Create socket mode handler
-            self.handler = SocketModeHandler(
+            self.handler = AsyncSocketModeHandler(
                 app=self.app,
                 app_token=self.credentials["SLACK_APP_TOKEN"]
             )
-            
-            # Start in a separate thread
-            self.thread = threading.Thread(target=self.handler.start)
+
+            # Host the loop on a background thread; start_async runs until
+            # close_async is called from cleanup()
+            self._loop = asyncio.new_event_loop()
+            self._loop.set_default_executor(self._executor)
+
+            def _run_loop():
+                asyncio.set_event_loop(self._loop)
+                self._send_queue = asyncio.Queue()
+                self._send_task = self._loop.create_task(self._send_worker())
+                try:
+                    self._loop.run_until_complete(self.handler.start_async())
+                except Exception as e:
+                    logger.error(f"Slack socket loop exited: {str(e)}")
+                finally:
+                    self._loop.close()
+
+            self.thread = threading.Thread(target=_run_loop)
             self.thread.daemon = True
             self.thread.start()
-            
+
             self._running = True
+            self._ready_flag.set()
             logger.info("Slack bot started successfully")
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to start Slack bot: {str(e)}")
             self._running = False
@@ -97,64 +447,107 @@ class SlackBot:
 
     def cleanup(self):
         """Clean up bot resources."""
-        if self.handler:
-            self.handler.close()
-            self.handler = None
+        if self.handler and self._loop and self._loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    self.handler.close_async(), self._loop
+                ).result(timeout=5)
+            except Exception as e:
+                logger.warning(f"Error closing socket handler: {str(e)}")
+        self.handler = None
+        if self._send_task and self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._send_task.cancel)
+        self._send_task = None
+        self._send_queue = None
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
         self.app = None
         self.thread = None
+        self._loop = None
         self._running = False
+        self._ready_flag.clear()
 
     def is_running(self) -> bool:
         """Check if the bot is running."""
         return self._running and self.thread and self.thread.is_alive()
 
     def register_listeners(self):
-        """Register all event listeners."""
-        
+        """Register all event listeners.
+
+        Listeners ack and return immediately, scheduling the real work as
+        a task on the loop. Bolt's lazy listeners solve the same problem
+        for FaaS deployments; in Socket Mode, ack-then-schedule keeps the
+        3-second ack SLA and frees the reader for the next event even
+        while a cold-cache query is still running.
+        """
+
         # Handle direct messages
         @self.app.message("")
-        def handle_message(message, say, ack):
-            ack()
-            # Ignore messages from the bot itself
-            if "bot_id" in message:
+        async def handle_message(message, say, ack):
+            await ack()
+            # Ignore the bot's own messages (say() echoes would otherwise
+            # loop back through the pipeline) and Slack redeliveries
+            if "bot_id" in message or self._is_duplicate(message):
                 return
-                
-            user_query = message["text"]
-            logger.info(f"Received DM: {user_query}")
-            self._process_query(user_query, say, message)
+
+            asyncio.create_task(self._handle_direct_message(message, say))
 
         # Handle mentions
         @self.app.event("app_mention")
-        def handle_mention(event, say):
+        async def handle_mention(event, say):
             text = event["text"].split(">", 1)[1].strip()
-            logger.info(f"Received mention: {text}")
-            self._process_query(text, say, event)
+            logger.info("Received mention (%d chars)", len(text))
+            asyncio.create_task(self._process_query(text, say, event))
 
         # Handle app home opened
         @self.app.event("app_home_opened")
-        def handle_app_home_opened(event, client):
-            logger.info(f"App home opened by user: {event['user']}")
+        async def handle_app_home_opened(event, client):
+            logger.info("App home opened by user: %s", event['user'])
             # You could update the home tab here if needed
 
-    def _process_query(self, query: str, say, message):
+    async def _process_query(self, query: str, say, message):
         """Process a query and send response."""
-        if self.rag_system.is_ready():
+        # One lookup instead of repeating the get() chain per reply path
+        thread_ts = message.get("thread_ts") or message.get("ts")
+        query = _normalize(query)
+        if self._ready_flag.is_set():
+            loop = asyncio.get_running_loop()
+
+            # Same semantic short-circuit as the DM path: paraphrased
+            # mentions skip retrieval and generation entirely
+            if self._semantic_cache:
+                cached = await loop.run_in_executor(
+                    self._executor, self._semantic_cache.get, query
+                )
+                if cached is not None:
+                    logger.info("Returning semantically cached response")
+                    self._queue_send(say, cached, thread_ts)
+                    return
+
+            if not self._breaker.allow():
+                logger.warning("Circuit breaker open; short-circuiting query")
+                self._queue_send(say, BREAKER_OPEN_MESSAGE, thread_ts)
+                return
             try:
-                response = self.rag_system.process_query(query)
-                logger.info(f"Sending response: {response}")
-                say(text=response, thread_ts=message.get("thread_ts", message.get("ts")))
+                cache_key = response_cache.make_key(query, self._cache_config)
+                response = await asyncio.wrap_future(self._shared_response(cache_key, query))
+                if self._semantic_cache:
+                    await loop.run_in_executor(
+                        self._executor, self._semantic_cache.set, query, response
+                    )
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Sending response (%d chars)", len(response))
+                self._queue_send(say, response, thread_ts)
             except Exception as e:
-                logger.error(f"Error processing message: {e}")
-                say(text="Sorry, I couldn't process your request. Please try again.", 
-                    thread_ts=message.get("thread_ts", message.get("ts")))
+                logger.error("Error processing message: %s", e)
+                self._queue_send(say, "Sorry, I couldn't process your request. Please try again.",
+                                 thread_ts)
         else:
             logger.warning("RAG system not initialized")
-            say(text="The knowledge base is not initialized. Please upload documents first.",
-                thread_ts=message.get("thread_ts", message.get("ts")))
+            self._queue_send(say, "The knowledge base is not initialized. Please upload documents first.",
+                             thread_ts)
 
     def is_ready(self) -> bool:
         """Check if the bot is ready to process messages."""
-        return self.rag_system.is_ready() and all([
-            self.credentials["SLACK_BOT_TOKEN"].startswith("xoxb-"),
-            self.credentials["SLACK_APP_TOKEN"].startswith("xapp-")
-        ]) 
\ No newline at end of file
+        return self._ready_flag.is_set() and self._tokens_valid
\ No newline at end of file